@@ -2,7 +2,7 @@
 Flask Backend API for Blockchain Identity Verification System
 """
 
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, render_template
 from flask_cors import CORS
 import time
 import os
@@ -10,6 +10,7 @@ from backend.blockchain import Blockchain
 from backend.identity import IdentityManager
 from backend.credential import CredentialManager
 from backend.blockchain import Transaction
+from backend.serialization import canonical_json, response_json
 
 # Get the directory where this file is located
 base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -20,11 +21,24 @@ app = Flask(__name__, template_folder=template_dir, static_folder=static_dir)
 CORS(app)
 
 # Initialize core components
-blockchain = Blockchain()
+# Set MINING_PROCESSES above 1 to split proof of work across processes;
+# leave it unset when running under gevent workers
+blockchain = Blockchain(
+    difficulty=int(os.environ.get('MINING_DIFFICULTY', '2')),
+    mining_processes=int(os.environ.get('MINING_PROCESSES', '0'))
+)
+# Mine in the background so proof of work stays off the request path;
+# /api/blockchain/mine still flushes pending transactions immediately
+blockchain.start_background_miner(batch_size=10, interval=30.0)
 identity_manager = IdentityManager()
 credential_manager = CredentialManager(blockchain, identity_manager)
 
 
+def jsonify_fast(payload) -> Response:
+    """Build a JSON response, serializing dataclasses such as blocks directly"""
+    return Response(response_json(payload), mimetype='application/json')
+
+
 # ==================== Identity Management Endpoints ====================
 
 @app.route('/api/identity/create', methods=['POST'])
@@ -37,7 +51,10 @@ def create_identity():
         role = data.get('role', 'user')
         
         if not name or not email:
-            return jsonify({'error': 'Name and email are required'}), 400
+            return jsonify_fast({'error': 'Name and email are required'}), 400
+        
+        # Reject fields the blockchain cannot hash before storing the identity
+        canonical_json({'name': name, 'email': email, 'role': role})
         
         identity = identity_manager.create_identity(name, email, role)
         
@@ -57,13 +74,15 @@ def create_identity():
         # Return identity (including private key for demo purposes)
         response_identity = identity.copy()
         
-        return jsonify({
+        return jsonify_fast({
             'success': True,
             'identity': response_identity
         }), 201
     
+    except ValueError as e:
+        return jsonify_fast({'error': str(e)}), 400
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return jsonify_fast({'error': str(e)}), 500
 
 
 @app.route('/api/identity/<did>', methods=['GET'])
@@ -71,13 +90,13 @@ def get_identity(did):
     """Get identity by DID"""
     identity = identity_manager.get_identity(did)
     if not identity:
-        return jsonify({'error': 'Identity not found'}), 404
+        return jsonify_fast({'error': 'Identity not found'}), 404
     
     # Don't expose private key in GET request
     response_identity = identity.copy()
     response_identity.pop('private_key', None)
     
-    return jsonify(response_identity), 200
+    return jsonify_fast(response_identity), 200
 
 
 # ==================== Credential Management Endpoints ====================
@@ -93,7 +112,7 @@ def issue_credential():
         credential_data = data.get('credential_data')
         
         if not all([issuer_did, recipient_did, credential_type, credential_data]):
-            return jsonify({'error': 'Missing required fields'}), 400
+            return jsonify_fast({'error': 'Missing required fields'}), 400
         
         credential = credential_manager.issue_credential(
             issuer_did,
@@ -102,15 +121,15 @@ def issue_credential():
             credential_data
         )
         
-        return jsonify({
+        return jsonify_fast({
             'success': True,
             'credential': credential
         }), 201
     
     except ValueError as e:
-        return jsonify({'error': str(e)}), 400
+        return jsonify_fast({'error': str(e)}), 400
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return jsonify_fast({'error': str(e)}), 500
 
 
 @app.route('/api/credential/verify/<credential_id>', methods=['POST'])
@@ -122,17 +141,17 @@ def verify_credential(credential_id):
         
         result = credential_manager.verify_credential(credential_id, verifier_did)
         
-        return jsonify(result), 200
+        return jsonify_fast(result), 200
     
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return jsonify_fast({'error': str(e)}), 500
 
 
 @app.route('/api/credential/recipient/<recipient_did>', methods=['GET'])
 def get_recipient_credentials(recipient_did):
     """Get all credentials for a recipient"""
     credentials = credential_manager.get_credentials_by_recipient(recipient_did)
-    return jsonify({
+    return jsonify_fast({
         'success': True,
         'credentials': credentials
     }), 200
@@ -142,7 +161,7 @@ def get_recipient_credentials(recipient_did):
 def get_issuer_credentials(issuer_did):
     """Get all credentials issued by an issuer"""
     credentials = credential_manager.get_credentials_by_issuer(issuer_did)
-    return jsonify({
+    return jsonify_fast({
         'success': True,
         'credentials': credentials
     }), 200
@@ -156,37 +175,28 @@ def mine_block():
     try:
         block = blockchain.mine_pending_transactions()
         if not block:
-            return jsonify({'message': 'No pending transactions to mine'}), 200
+            return jsonify_fast({'message': 'No pending transactions to mine'}), 200
         
-        return jsonify({
+        return jsonify_fast({
             'success': True,
             'message': 'Block mined successfully',
-            'block': block.to_dict()
+            'block': block
         }), 200
     
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return jsonify_fast({'error': str(e)}), 500
 
 
 @app.route('/api/blockchain/chain', methods=['GET'])
 def get_chain():
     """Get the entire blockchain"""
-    return jsonify({
-        'chain': blockchain.get_chain(),
-        'length': len(blockchain.chain),
-        'valid': blockchain.is_chain_valid()
-    }), 200
+    return Response(blockchain.get_chain_bytes(), mimetype='application/json'), 200
 
 
 @app.route('/api/blockchain/status', methods=['GET'])
 def get_blockchain_status():
     """Get blockchain status"""
-    return jsonify({
-        'chain_length': len(blockchain.chain),
-        'pending_transactions': len(blockchain.pending_transactions),
-        'is_valid': blockchain.is_chain_valid(),
-        'difficulty': blockchain.difficulty
-    }), 200
+    return Response(blockchain.get_status_bytes(), mimetype='application/json'), 200
 
 
 # ==================== Frontend Routes ====================
@@ -222,5 +232,5 @@ def view_credentials_page():
 
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(debug=False, threaded=True, host='0.0.0.0', port=5000)
 
@@ -4,19 +4,96 @@ Stores credential hashes and identity records without smart contracts
 """
 
 import hashlib
-import json
+import logging
+import multiprocessing
+import threading
 import time
-from typing import List, Dict, Any
-from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from dataclasses import dataclass, field
+from .serialization import canonical_json, response_json
 
+logger = logging.getLogger(__name__)
 
-@dataclass
+# Proof of work at or above this difficulty is split across the mining pool.
+# Dispatching to an already-running pool costs about 0.5 ms; a sequential
+# search takes about 1.6 ms at difficulty 3 and 40 ms at difficulty 4
+PARALLEL_MINING_DIFFICULTY = 4
+
+# How many nonces a mining worker tries between checks of the stop event
+MINING_STOP_CHECK_INTERVAL = 4096
+
+# Set in each pool worker; signals that another worker has found a nonce
+_mining_stop_event = None
+
+
+def _init_mining_worker(stop_event) -> None:
+    """Store the shared stop event in a mining pool worker"""
+    global _mining_stop_event
+    _mining_stop_event = stop_event
+
+
+def _search_nonce(head: bytes, tail: bytes, difficulty: int, start: int, step: int) -> Optional[int]:
+    """Find the first nonce in start, start + step, ... whose header hash meets difficulty"""
+    # Compare raw digests instead of hex: difficulty hex zeros are
+    # difficulty // 2 zero bytes plus a zero high nibble when odd
+    zero_bytes = bytes(difficulty // 2)
+    odd_nibble = difficulty % 2
+    head_hasher = hashlib.sha256(head)
+    stop_event = _mining_stop_event
+    nonce = start
+    
+    while True:
+        for nonce in range(nonce, nonce + step * MINING_STOP_CHECK_INTERVAL, step):
+            hasher = head_hasher.copy()
+            hasher.update(b'%d%b' % (nonce, tail))
+            digest = hasher.digest()
+            if digest.startswith(zero_bytes) and not (odd_nibble and digest[len(zero_bytes)] >> 4):
+                if stop_event is not None:
+                    stop_event.set()
+                return nonce
+        if stop_event is not None and stop_event.is_set():
+            return None
+        nonce += step
+
+
+class MiningPool:
+    """Long-lived process pool that splits the nonce search across CPU cores"""
+    
+    def __init__(self, processes: int):
+        self.processes = processes
+        # Workers are always forked: under spawn they would re-import the
+        # application module, which builds its own pool, and fail to start
+        context = multiprocessing.get_context('fork')
+        self._stop_event = context.Event()
+        self._pool = context.Pool(
+            processes, initializer=_init_mining_worker, initargs=(self._stop_event,)
+        )
+    
+    def search_nonce(self, head: bytes, tail: bytes, difficulty: int, start: int) -> int:
+        """Search interleaved nonce ranges in every worker and return a valid nonce"""
+        self._stop_event.clear()
+        results = self._pool.starmap(_search_nonce, [
+            (head, tail, difficulty, start + rank, self.processes)
+            for rank in range(self.processes)
+        ])
+        return min(result for result in results if result is not None)
+    
+    def close(self) -> None:
+        """Stop the worker processes"""
+        self._pool.terminate()
+
+
+@dataclass(slots=True)
 class Transaction:
     """Represents a transaction on the blockchain"""
     transaction_type: str  # 'identity_creation', 'credential_issuance', 'credential_verification'
     data: Dict[str, Any]
     timestamp: float
     signature: str = ""
+    # Memoized for hash-index lookups; Merkle roots use compute_digest so that
+    # chain validation still sees in-place edits to data
+    _cached_digest: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
+    _cached_hex: Optional[str] = field(default=None, init=False, repr=False, compare=False)
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert transaction to dictionary for hashing"""
@@ -26,13 +103,24 @@ class Transaction:
             'timestamp': self.timestamp
         }
     
+    def compute_digest(self) -> bytes:
+        """Compute raw SHA-256 digest of transaction from its current fields"""
+        return hashlib.sha256(canonical_json(self.to_dict())).digest()
+    
+    def digest(self) -> bytes:
+        """Generate raw SHA-256 digest of transaction, memoized on first use"""
+        if self._cached_digest is None:
+            self._cached_digest = self.compute_digest()
+        return self._cached_digest
+    
     def hash(self) -> str:
         """Generate hash of transaction"""
-        transaction_string = json.dumps(self.to_dict(), sort_keys=True)
-        return hashlib.sha256(transaction_string.encode()).hexdigest()
+        if self._cached_hex is None:
+            self._cached_hex = self.digest().hex()
+        return self._cached_hex
 
 
-@dataclass
+@dataclass(slots=True)
 class Block:
     """Represents a block in the blockchain"""
     index: int
@@ -48,62 +136,96 @@ class Block:
         if not self.transactions:
             return ""
         
-        # Convert transactions to hashes
-        transaction_hashes = [tx.hash() for tx in self.transactions]
+        # Hash transactions fresh so validation detects modified data;
+        # only the root is hex-encoded
+        transaction_hashes = [tx.compute_digest() for tx in self.transactions]
         
         # Build Merkle tree
         while len(transaction_hashes) > 1:
-            if len(transaction_hashes) % 2 == 1:
-                transaction_hashes.append(transaction_hashes[-1])
-            
-            new_level = []
-            for i in range(0, len(transaction_hashes), 2):
-                combined = transaction_hashes[i] + transaction_hashes[i + 1]
-                new_level.append(hashlib.sha256(combined.encode()).hexdigest())
-            transaction_hashes = new_level
+            transaction_hashes = self._next_merkle_level(transaction_hashes)
         
-        return transaction_hashes[0] if transaction_hashes else ""
+        return transaction_hashes[0].hex()
     
-    def calculate_hash(self) -> str:
-        """Calculate hash of the block"""
-        block_string = json.dumps({
+    @staticmethod
+    def _next_merkle_level(nodes: List[bytes]) -> List[bytes]:
+        """Hash adjacent pairs of nodes into the next Merkle level"""
+        # An unpaired last node is promoted as-is rather than hashed with a copy of itself
+        new_level = [
+            hashlib.sha256(nodes[i] + nodes[i + 1]).digest()
+            for i in range(0, len(nodes) - 1, 2)
+        ]
+        if len(nodes) % 2 == 1:
+            new_level.append(nodes[-1])
+        return new_level
+    
+    def header(self) -> Dict[str, Any]:
+        """Get the block header fields covered by the block hash"""
+        return {
             'index': self.index,
             'previous_hash': self.previous_hash,
             'merkle_root': self.merkle_root,
             'timestamp': self.timestamp,
             'nonce': self.nonce
-        }, sort_keys=True)
-        return hashlib.sha256(block_string.encode()).hexdigest()
+        }
+    
+    def calculate_hash(self) -> str:
+        """Calculate hash of the block"""
+        return hashlib.sha256(canonical_json(self.header())).hexdigest()
     
-    def mine_block(self, difficulty: int = 2) -> None:
+    def header_template(self) -> Tuple[bytes, bytes]:
+        """Split the serialized header into the bytes before and after the nonce value"""
+        header = self.header()
+        header['nonce'] = 0
+        head, tail = canonical_json(header).split(b'"nonce":0', 1)
+        return head + b'"nonce":', tail
+    
+    def mine_block(self, difficulty: int = 2, mining_pool: Optional[MiningPool] = None) -> None:
         """Mine the block with proof of work"""
         self.merkle_root = self.calculate_merkle_root()
-        prefix = '0' * difficulty
+        if self.hash.startswith('0' * difficulty):
+            return
         
-        while not self.hash.startswith(prefix):
-            self.nonce += 1
-            self.hash = self.calculate_hash()
-    
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert block to dictionary"""
-        return {
-            'index': self.index,
-            'previous_hash': self.previous_hash,
-            'transactions': [asdict(tx) for tx in self.transactions],
-            'timestamp': self.timestamp,
-            'merkle_root': self.merkle_root,
-            'nonce': self.nonce,
-            'hash': self.hash
-        }
+        # Only the nonce changes between attempts, so the header is split once
+        # around it and workers only format the nonce and hash the tail
+        head, tail = self.header_template()
+        
+        if mining_pool is not None and difficulty >= PARALLEL_MINING_DIFFICULTY:
+            nonce = mining_pool.search_nonce(head, tail, difficulty, self.nonce + 1)
+        else:
+            nonce = _search_nonce(head, tail, difficulty, self.nonce + 1, 1)
+        
+        self.nonce = nonce
+        self.hash = self.calculate_hash()
 
 
 class Blockchain:
     """Simple blockchain implementation for identity verification"""
     
-    def __init__(self):
+    def __init__(self, difficulty: int = 2, mining_processes: int = 0):
         self.chain: List[Block] = []
         self.pending_transactions: List[Transaction] = []
-        self.difficulty = 2
+        self.difficulty = difficulty
+        self._tx_hash_index: Set[str] = set()
+        # credential_id -> (transaction hash, credential hash) of its issuance
+        self._credential_tx_index: Dict[str, Tuple[str, str]] = {}
+        # Guards chain and pending transactions against concurrent requests
+        self._lock = threading.RLock()
+        # Serializes mining so concurrent flushes cannot mine the same transactions
+        self._mining_lock = threading.Lock()
+        self._pending_event = threading.Event()
+        self._miner_thread: Optional[threading.Thread] = None
+        self._miner_batch_size: Optional[int] = None
+        # Bumped after every mutation so serialized API responses can be reused
+        self._version = 0
+        self._response_cache: Dict[str, Tuple[Tuple[int, int], bytes]] = {}
+        # Parallel mining is opt-in; the pool is forked here, before any
+        # background threads exist, and reused for every block
+        self._mining_pool: Optional[MiningPool] = None
+        if mining_processes > 1:
+            if 'fork' in multiprocessing.get_all_start_methods():
+                self._mining_pool = MiningPool(mining_processes)
+            else:
+                logger.warning("Parallel mining needs the fork start method; mining sequentially")
         self.create_genesis_block()
     
     def create_genesis_block(self) -> None:
@@ -120,33 +242,91 @@ class Blockchain:
             timestamp=time.time()
         )
         genesis_block.mine_block(self.difficulty)
-        self.chain.append(genesis_block)
+        self._append_block(genesis_block)
     
     def get_latest_block(self) -> Block:
         """Get the latest block in the chain"""
         return self.chain[-1]
     
+    def _append_block(self, block: Block) -> None:
+        """Append a mined block to the chain and index its transactions"""
+        self.chain.append(block)
+        self._tx_hash_index.update(tx.hash() for tx in block.transactions)
+    
     def add_transaction(self, transaction: Transaction) -> None:
         """Add a transaction to pending transactions"""
-        self.pending_transactions.append(transaction)
+        # Hash before touching any state: data that cannot be serialized raises
+        # ValueError here instead of leaving an unminable pending transaction
+        tx_hash = transaction.hash()
+        with self._lock:
+            self.pending_transactions.append(transaction)
+            self._tx_hash_index.add(tx_hash)
+            if transaction.transaction_type == 'credential_issuance':
+                credential_id = transaction.data.get('credential_id')
+                if credential_id is not None:
+                    self._credential_tx_index[credential_id] = (
+                        tx_hash,
+                        transaction.data.get('credential_hash')
+                    )
+            # Bumped only after all state is updated, so a response cached
+            # under the new version never reflects a partial mutation
+            self._version += 1
+            if (
+                self._miner_batch_size is not None
+                and len(self.pending_transactions) >= self._miner_batch_size
+            ):
+                self._pending_event.set()
     
     def mine_pending_transactions(self) -> Block:
         """Mine pending transactions into a new block"""
-        if not self.pending_transactions:
-            return None
-        
-        block = Block(
-            index=len(self.chain),
-            previous_hash=self.get_latest_block().hash,
-            transactions=self.pending_transactions.copy(),
-            timestamp=time.time()
+        # Only one block is mined at a time, but the state lock is held just
+        # long enough to snapshot and append, so transactions can still be
+        # queued while proof of work runs
+        with self._mining_lock:
+            with self._lock:
+                if not self.pending_transactions:
+                    return None
+                
+                transactions = self.pending_transactions.copy()
+                block = Block(
+                    index=len(self.chain),
+                    previous_hash=self.get_latest_block().hash,
+                    transactions=transactions,
+                    timestamp=time.time()
+                )
+            
+            block.mine_block(self.difficulty, self._mining_pool)
+            
+            with self._lock:
+                self._append_block(block)
+                # Keep transactions that were added while mining
+                self.pending_transactions = self.pending_transactions[len(transactions):]
+                self._version += 1
+            
+            return block
+    
+    def start_background_miner(self, batch_size: int = 10, interval: float = 30.0) -> None:
+        """Mine pending transactions in a background thread when a batch fills or on an interval"""
+        if self._miner_thread is not None:
+            return
+        self._miner_batch_size = batch_size
+        self._miner_thread = threading.Thread(
+            target=self._miner_loop,
+            args=(interval,),
+            name='blockchain-miner',
+            daemon=True
         )
-        
-        block.mine_block(self.difficulty)
-        self.chain.append(block)
-        self.pending_transactions = []
-        
-        return block
+        self._miner_thread.start()
+    
+    def _miner_loop(self, interval: float) -> None:
+        """Wait for a full batch or the interval to elapse, then mine"""
+        while True:
+            self._pending_event.wait(timeout=interval)
+            self._pending_event.clear()
+            try:
+                self.mine_pending_transactions()
+            except Exception:
+                logger.exception("Background mining failed")
     
     def is_chain_valid(self) -> bool:
         """Validate the entire blockchain"""
@@ -168,9 +348,37 @@ class Blockchain:
         
         return True
     
-    def get_chain(self) -> List[Dict[str, Any]]:
-        """Get the entire chain as a list of dictionaries"""
-        return [block.to_dict() for block in self.chain]
+    def get_chain(self) -> List[Block]:
+        """Get the entire chain as a list of blocks, ready for direct serialization"""
+        return list(self.chain)
+    
+    def _cached_response(self, name: str, build: Callable[[], Dict[str, Any]]) -> bytes:
+        """Get a serialized response, rebuilding it only after the chain has changed"""
+        # The key is read before building; a mutation that lands mid-build
+        # bumps the version afterwards, so the entry is rebuilt on next read
+        key = (self._version, self.difficulty)
+        cached = self._response_cache.get(name)
+        if cached is None or cached[0] != key:
+            cached = (key, response_json(build()))
+            self._response_cache[name] = cached
+        return cached[1]
+    
+    def get_chain_bytes(self) -> bytes:
+        """Get the serialized chain response"""
+        return self._cached_response('chain', lambda: {
+            'chain': self.get_chain(),
+            'length': len(self.chain),
+            'valid': self.is_chain_valid()
+        })
+    
+    def get_status_bytes(self) -> bytes:
+        """Get the serialized status response"""
+        return self._cached_response('status', lambda: {
+            'chain_length': len(self.chain),
+            'pending_transactions': len(self.pending_transactions),
+            'is_valid': self.is_chain_valid(),
+            'difficulty': self.difficulty
+        })
     
     def get_transactions_by_type(self, transaction_type: str) -> List[Transaction]:
         """Get all transactions of a specific type"""
@@ -181,14 +389,13 @@ class Blockchain:
                     transactions.append(tx)
         return transactions
     
+    def get_credential_transaction_hash(self, credential_id: str, credential_hash: str) -> Optional[str]:
+        """Get the hash of the transaction that issued a credential with the given hash"""
+        entry = self._credential_tx_index.get(credential_id)
+        if entry is None or entry[1] != credential_hash:
+            return None
+        return entry[0]
+    
     def verify_transaction_exists(self, transaction_hash: str) -> bool:
         """Verify if a transaction exists in the blockchain"""
-        for block in self.chain:
-            for tx in block.transactions:
-                if tx.hash() == transaction_hash:
-                    return True
-        for tx in self.pending_transactions:
-            if tx.hash() == transaction_hash:
-                return True
-        return False
-
+        return transaction_hash in self._tx_hash_index
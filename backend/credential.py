@@ -3,11 +3,14 @@ Credential Management System
 Handles issuance, verification, and storage of digital credentials
 """
 
+import threading
 import time
 import uuid
+from collections import defaultdict
 from typing import Dict, Any, List, Optional
 from .identity import IdentityManager
 from .blockchain import Blockchain, Transaction
+from .serialization import canonical_json
 
 
 class CredentialManager:
@@ -17,6 +20,10 @@ class CredentialManager:
         self.blockchain = blockchain
         self.identity_manager = identity_manager
         self.credentials: Dict[str, Dict[str, Any]] = {}
+        self._by_recipient: Dict[str, List[str]] = defaultdict(list)
+        self._by_issuer: Dict[str, List[str]] = defaultdict(list)
+        # Guards the credential store and its indexes against concurrent requests
+        self._lock = threading.Lock()
     
     def issue_credential(
         self,
@@ -52,28 +59,25 @@ class CredentialManager:
             'status': 'active'
         }
         
-        # Sign credential with issuer's private key
-        credential_to_sign = {
-            'credential_id': credential_id,
-            'issuer_did': issuer_did,
-            'recipient_did': recipient_did,
-            'credential_type': credential_type,
-            'credential_data': credential_data,
-            'issued_at': credential['issued_at']
-        }
+        # Serialize the signed fields once for both hashing and signing
+        canonical = canonical_json(self._signed_fields(credential))
         
         signature = self.identity_manager.sign_data(
-            credential_to_sign,
-            issuer['private_key']
+            canonical,
+            issuer['private_key'],
+            self.identity_manager.get_key_type(issuer)
         )
         credential['signature'] = signature
         
         # Hash credential for blockchain storage
-        credential_hash = self.identity_manager.hash_credential(credential_to_sign)
+        credential_hash = self.identity_manager.hash_credential(canonical)
         credential['credential_hash'] = credential_hash
         
-        # Store credential
-        self.credentials[credential_id] = credential
+        # Store credential and index it by recipient and issuer
+        with self._lock:
+            self.credentials[credential_id] = credential
+            self._by_recipient[recipient_did].append(credential_id)
+            self._by_issuer[issuer_did].append(credential_id)
         
         # Create blockchain transaction
         transaction = Transaction(
@@ -92,6 +96,17 @@ class CredentialManager:
         
         return credential
     
+    def _signed_fields(self, credential: Dict[str, Any]) -> Dict[str, Any]:
+        """Get the credential fields covered by the issuer's signature"""
+        return {
+            'credential_id': credential['credential_id'],
+            'issuer_did': credential['issuer_did'],
+            'recipient_did': credential['recipient_did'],
+            'credential_type': credential['credential_type'],
+            'credential_data': credential['credential_data'],
+            'issued_at': credential['issued_at']
+        }
+    
     def verify_credential(self, credential_id: str, verifier_did: Optional[str] = None) -> Dict[str, Any]:
         """Verify a credential"""
         # Get credential
@@ -110,53 +125,32 @@ class CredentialManager:
                 'error': 'Issuer not found'
             }
         
-        # Reconstruct credential data for verification
-        credential_to_verify = {
-            'credential_id': credential['credential_id'],
-            'issuer_did': credential['issuer_did'],
-            'recipient_did': credential['recipient_did'],
-            'credential_type': credential['credential_type'],
-            'credential_data': credential['credential_data'],
-            'issued_at': credential['issued_at']
-        }
+        # Rebuild the signed bytes from the credential's current fields
+        canonical = canonical_json(self._signed_fields(credential))
         
         # Verify signature
         signature_valid = self.identity_manager.verify_signature(
-            credential_to_verify,
+            canonical,
             credential['signature'],
-            issuer['public_key']
+            issuer['public_key'],
+            self.identity_manager.get_key_type(issuer)
         )
         
         # Verify credential hash matches
-        expected_hash = self.identity_manager.hash_credential(credential_to_verify)
+        expected_hash = self.identity_manager.hash_credential(canonical)
         hash_valid = credential['credential_hash'] == expected_hash
         
         # Verify credential exists in blockchain
         transaction_hash = credential.get('transaction_hash')
-        if transaction_hash:
-            blockchain_valid = self.blockchain.verify_transaction_exists(transaction_hash)
-        else:
-            blockchain_valid = False
-            for block in self.blockchain.chain:
-                for tx in block.transactions:
-                    if (
-                        tx.transaction_type == 'credential_issuance'
-                        and tx.data.get('credential_id') == credential['credential_id']
-                        and tx.data.get('credential_hash') == credential['credential_hash']
-                    ):
-                        blockchain_valid = True
-                        break
-                if blockchain_valid:
-                    break
-            if not blockchain_valid:
-                for tx in self.blockchain.pending_transactions:
-                    if (
-                        tx.transaction_type == 'credential_issuance'
-                        and tx.data.get('credential_id') == credential['credential_id']
-                        and tx.data.get('credential_hash') == credential['credential_hash']
-                    ):
-                        blockchain_valid = True
-                        break
+        if not transaction_hash:
+            transaction_hash = self.blockchain.get_credential_transaction_hash(
+                credential_id,
+                credential['credential_hash']
+            )
+        blockchain_valid = (
+            transaction_hash is not None
+            and self.blockchain.verify_transaction_exists(transaction_hash)
+        )
         
         # Overall verification result
         is_valid = signature_valid and hash_valid and blockchain_valid
@@ -176,17 +170,11 @@ class CredentialManager:
     
     def get_credentials_by_recipient(self, recipient_did: str) -> List[Dict[str, Any]]:
         """Get all credentials for a recipient"""
-        return [
-            cred for cred in self.credentials.values()
-            if cred['recipient_did'] == recipient_did
-        ]
+        return [self.credentials[cid] for cid in self._by_recipient.get(recipient_did, ())]
     
     def get_credentials_by_issuer(self, issuer_did: str) -> List[Dict[str, Any]]:
         """Get all credentials issued by an issuer"""
-        return [
-            cred for cred in self.credentials.values()
-            if cred['issuer_did'] == issuer_did
-        ]
+        return [self.credentials[cid] for cid in self._by_issuer.get(issuer_did, ())]
     
     def get_credential(self, credential_id: str) -> Optional[Dict[str, Any]]:
         """Get credential by ID"""
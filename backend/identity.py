@@ -3,14 +3,48 @@ Identity Management System
 Handles Decentralized Identifiers (DIDs), key generation, and cryptographic signatures
 """
 
+import functools
 import hashlib
-import json
+import secrets
 import time
-from typing import Dict, Any, Optional
-from cryptography.hazmat.primitives.asymmetric import rsa, padding
+from typing import Dict, Any, Optional, Union
+from cryptography.hazmat.primitives.asymmetric import ed25519, padding
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.backends import default_backend
 import base64
+from .serialization import canonical_json
+
+KEY_TYPE_ED25519 = 'ed25519'
+# Identities created before the switch to Ed25519 have no key_type and carry
+# PEM-encoded RSA keys
+KEY_TYPE_RSA = 'rsa'
+
+
+@functools.lru_cache(maxsize=1024)
+def _load_private_key(key_string: str, key_type: str):
+    """Load a private key object, caching it by its serialized form"""
+    if key_type == KEY_TYPE_ED25519:
+        return ed25519.Ed25519PrivateKey.from_private_bytes(base64.b64decode(key_string))
+    if key_type == KEY_TYPE_RSA:
+        return serialization.load_pem_private_key(
+            key_string.encode('utf-8'),
+            password=None,
+            backend=default_backend()
+        )
+    raise ValueError(f"Unsupported key type: {key_type}")
+
+
+@functools.lru_cache(maxsize=1024)
+def _load_public_key(key_string: str, key_type: str):
+    """Load a public key object, caching it by its serialized form"""
+    if key_type == KEY_TYPE_ED25519:
+        return ed25519.Ed25519PublicKey.from_public_bytes(base64.b64decode(key_string))
+    if key_type == KEY_TYPE_RSA:
+        return serialization.load_pem_public_key(
+            key_string.encode('utf-8'),
+            backend=default_backend()
+        )
+    raise ValueError(f"Unsupported key type: {key_type}")
 
 
 class IdentityManager:
@@ -21,52 +55,43 @@ class IdentityManager:
     
     def generate_did(self) -> str:
         """Generate a new Decentralized Identifier (DID)"""
-        # Simple DID format: did:identity:hash
-        random_data = str(time.time()) + str(hash(time.time()))
-        did_hash = hashlib.sha256(random_data.encode()).hexdigest()[:16]
-        return f"did:identity:{did_hash}"
+        # Simple DID format: did:identity:<16 random hex chars>
+        return f"did:identity:{secrets.token_hex(8)}"
     
     def generate_key_pair(self) -> tuple:
-        """Generate RSA key pair for signing"""
-        private_key = rsa.generate_private_key(
-            public_exponent=65537,
-            key_size=2048,
-            backend=default_backend()
-        )
+        """Generate Ed25519 key pair for signing"""
+        private_key = ed25519.Ed25519PrivateKey.generate()
         public_key = private_key.public_key()
         return private_key, public_key
     
     def serialize_private_key(self, private_key) -> str:
-        """Serialize private key to PEM format string"""
-        pem = private_key.private_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PrivateFormat.PKCS8,
+        """Serialize private key to base64-encoded raw bytes"""
+        raw = private_key.private_bytes(
+            encoding=serialization.Encoding.Raw,
+            format=serialization.PrivateFormat.Raw,
             encryption_algorithm=serialization.NoEncryption()
         )
-        return pem.decode('utf-8')
+        return base64.b64encode(raw).decode('utf-8')
     
     def serialize_public_key(self, public_key) -> str:
-        """Serialize public key to PEM format string"""
-        pem = public_key.public_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        """Serialize public key to base64-encoded raw bytes"""
+        raw = public_key.public_bytes(
+            encoding=serialization.Encoding.Raw,
+            format=serialization.PublicFormat.Raw
         )
-        return pem.decode('utf-8')
+        return base64.b64encode(raw).decode('utf-8')
     
-    def deserialize_private_key(self, pem_string: str):
-        """Deserialize private key from PEM format string"""
-        return serialization.load_pem_private_key(
-            pem_string.encode('utf-8'),
-            password=None,
-            backend=default_backend()
-        )
+    def deserialize_private_key(self, key_string: str, key_type: str = KEY_TYPE_ED25519):
+        """Deserialize private key from base64 raw bytes, or PEM for legacy RSA keys"""
+        return _load_private_key(key_string, key_type)
     
-    def deserialize_public_key(self, pem_string: str):
-        """Deserialize public key from PEM format string"""
-        return serialization.load_pem_public_key(
-            pem_string.encode('utf-8'),
-            backend=default_backend()
-        )
+    def deserialize_public_key(self, key_string: str, key_type: str = KEY_TYPE_ED25519):
+        """Deserialize public key from base64 raw bytes, or PEM for legacy RSA keys"""
+        return _load_public_key(key_string, key_type)
+    
+    def get_key_type(self, identity: Dict[str, Any]) -> str:
+        """Get the key type of an identity, treating a missing value as legacy RSA"""
+        return identity.get('key_type', KEY_TYPE_RSA)
     
     def create_identity(self, name: str, email: str, role: str = "user") -> Dict[str, Any]:
         """Create a new identity with DID and key pair"""
@@ -78,6 +103,7 @@ class IdentityManager:
             'name': name,
             'email': email,
             'role': role,
+            'key_type': KEY_TYPE_ED25519,
             'public_key': self.serialize_public_key(public_key),
             'private_key': self.serialize_private_key(private_key),
             'created_at': time.time()
@@ -86,49 +112,64 @@ class IdentityManager:
         self.identities[did] = identity
         return identity
     
-    def sign_data(self, data: Dict[str, Any], private_key_pem: str) -> str:
-        """Sign data with private key"""
-        private_key = self.deserialize_private_key(private_key_pem)
+    def sign_data(
+        self,
+        data: Union[Dict[str, Any], bytes],
+        private_key_str: str,
+        key_type: str = KEY_TYPE_ED25519
+    ) -> str:
+        """Sign data (a dict or its canonical bytes) with private key"""
+        private_key = self.deserialize_private_key(private_key_str, key_type)
         
-        # Convert data to string for signing
-        data_string = json.dumps(data, sort_keys=True)
-        data_bytes = data_string.encode('utf-8')
+        # Convert data to canonical bytes for signing
+        data_bytes = data if isinstance(data, bytes) else canonical_json(data)
         
-        # Sign the data
-        signature = private_key.sign(
-            data_bytes,
-            padding.PSS(
-                mgf=padding.MGF1(hashes.SHA256()),
-                salt_length=padding.PSS.MAX_LENGTH
-            ),
-            hashes.SHA256()
-        )
+        # Sign the data; legacy RSA keys keep using PSS with SHA-256
+        if key_type == KEY_TYPE_RSA:
+            signature = private_key.sign(
+                data_bytes,
+                padding.PSS(
+                    mgf=padding.MGF1(hashes.SHA256()),
+                    salt_length=padding.PSS.MAX_LENGTH
+                ),
+                hashes.SHA256()
+            )
+        else:
+            signature = private_key.sign(data_bytes)
         
         # Encode signature as base64
         return base64.b64encode(signature).decode('utf-8')
     
-    def verify_signature(self, data: Dict[str, Any], signature: str, public_key_pem: str) -> bool:
-        """Verify signature with public key"""
+    def verify_signature(
+        self,
+        data: Union[Dict[str, Any], bytes],
+        signature: str,
+        public_key_str: str,
+        key_type: str = KEY_TYPE_ED25519
+    ) -> bool:
+        """Verify signature over data (a dict or its canonical bytes) with public key"""
         try:
-            public_key = self.deserialize_public_key(public_key_pem)
+            public_key = self.deserialize_public_key(public_key_str, key_type)
             
-            # Convert data to string
-            data_string = json.dumps(data, sort_keys=True)
-            data_bytes = data_string.encode('utf-8')
+            # Convert data to canonical bytes
+            data_bytes = data if isinstance(data, bytes) else canonical_json(data)
             
             # Decode signature
             signature_bytes = base64.b64decode(signature)
             
             # Verify signature
-            public_key.verify(
-                signature_bytes,
-                data_bytes,
-                padding.PSS(
-                    mgf=padding.MGF1(hashes.SHA256()),
-                    salt_length=padding.PSS.MAX_LENGTH
-                ),
-                hashes.SHA256()
-            )
+            if key_type == KEY_TYPE_RSA:
+                public_key.verify(
+                    signature_bytes,
+                    data_bytes,
+                    padding.PSS(
+                        mgf=padding.MGF1(hashes.SHA256()),
+                        salt_length=padding.PSS.MAX_LENGTH
+                    ),
+                    hashes.SHA256()
+                )
+            else:
+                public_key.verify(signature_bytes, data_bytes)
             return True
         except Exception:
             return False
@@ -137,8 +178,9 @@ class IdentityManager:
         """Get identity by DID"""
         return self.identities.get(did)
     
-    def hash_credential(self, credential_data: Dict[str, Any]) -> str:
-        """Generate hash of credential data"""
-        credential_string = json.dumps(credential_data, sort_keys=True)
-        return hashlib.sha256(credential_string.encode()).hexdigest()
+    def hash_credential(self, credential_data: Union[Dict[str, Any], bytes]) -> str:
+        """Generate hash of credential data (a dict or its canonical bytes)"""
+        if not isinstance(credential_data, bytes):
+            credential_data = canonical_json(credential_data)
+        return hashlib.sha256(credential_data).hexdigest()
 
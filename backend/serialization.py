@@ -0,0 +1,52 @@
+"""
+Canonical JSON serialization used for hashing and signing
+Prefers orjson when available and falls back to the standard library.
+The two encoders agree on ordinary payloads but not byte-for-byte on every
+value (e.g. 1e16 vs 1e+16, NaN vs null), so hashes are only stable within
+one configuration.
+"""
+
+import dataclasses
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    import json
+
+
+def canonical_json(obj: Any) -> bytes:
+    """Serialize obj to compact, key-sorted UTF-8 JSON bytes"""
+    # Unserializable input (e.g. integers beyond 64 bits for orjson) is
+    # reported as ValueError, which the API maps to a 400 response
+    try:
+        if orjson is not None:
+            return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+        return json.dumps(
+            obj, sort_keys=True, separators=(',', ':'), ensure_ascii=False
+        ).encode('utf-8')
+    except TypeError as e:
+        raise ValueError(f"Data cannot be serialized: {e}") from e
+
+
+def _public_fields(obj: Any) -> Any:
+    """Convert a dataclass to a dict of its public fields for the stdlib encoder"""
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return {
+            f.name: getattr(obj, f.name)
+            for f in dataclasses.fields(obj)
+            if not f.name.startswith('_')
+        }
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def response_json(obj: Any) -> bytes:
+    """Serialize an API payload, including dataclasses, to JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(
+            obj, option=orjson.OPT_SERIALIZE_DATACLASS | orjson.OPT_SORT_KEYS
+        )
+    return json.dumps(
+        obj, default=_public_fields, sort_keys=True, separators=(',', ':'), ensure_ascii=False
+    ).encode('utf-8')